@@ -1,13 +1,20 @@
 import os
 import json
+import time
 import hashlib
 import datetime
-from typing import Dict, Any, List, Tuple
+import functools
+from pathlib import Path
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 
+import orjson
 import pandas as pd
 
 # Local "agent" that fabricates python REPL steps based on the check and schema.
 from backend.use_agent import use_agent
+from backend.core_agents.orchestrator_agent import clear_planning_context
 
 ROOT = os.path.abspath(os.path.dirname(__file__))
 DATA_DIR = os.path.join(ROOT, "data")
@@ -15,123 +22,168 @@ CHECKS_JSON = os.path.join(ROOT, "checks", "checks.json")
 CACHE_DIR = os.path.join(ROOT, "cached_mem")
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+CHECKS_LAST_HASH = os.path.join(CACHE_DIR, "checks_last.sha256")
+# Snapshot of the checks table as of the last detected change (shown by the UI)
 CHECKS_LAST_CSV = os.path.join(CACHE_DIR, "checks_last.csv")
 SCHEMA_COLS_CACHE = os.path.join(CACHE_DIR, "schema_cols.json")
 WORKFLOW_CACHE = os.path.join(CACHE_DIR, "workflows.json")
+# Per-check copies of workflows.json entries (<check_id>.json) so the UI can load a single check
+WORKFLOW_SHARD_DIR = os.path.join(CACHE_DIR, "workflows")
+
+# use_agent is LLM/network-bound, so several checks can compile at once
+MAX_COMPILE_WORKERS = 8
+# Cache files are read whole; write them through a 1 MB buffer so a dump is a single write()
+WRITE_BUFFER = 1 << 20
 
 
 # -------------------------
 # Helpers
 # -------------------------
-def _stable_csv(df: pd.DataFrame) -> str:
-    """Return a normalized CSV string (sorted cols/rows) for stable hashing/compare."""
-    # Sort columns and rows for stability
-    df2 = df.copy()
-    # Ensure consistent column order
-    cols = sorted(df2.columns.tolist())
-    df2 = df2[cols]
-    # Try to coerce list/dict columns to JSON strings for stability
-    for c in df2.columns:
-        df2[c] = df2[c].apply(lambda x: json.dumps(x, sort_keys=True) if isinstance(x, (list, dict)) else x)
-    # Sort rows by all cols (stringify to avoid mixed types)
-    df2["_sortkey"] = df2.astype(str).agg("|".join, axis=1)
-    df2 = df2.sort_values("_sortkey").drop(columns=["_sortkey"])
-    return df2.to_csv(index=False, lineterminator="\n")
-
-
-def _sha256(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8")).hexdigest()
-
-
-def load_csv(name: str) -> pd.DataFrame:
-    p = os.path.join(DATA_DIR, f"{name}.csv")
-    if not os.path.exists(p):
-        # If the table is absent, return empty df with no cols so schema change detection can work.
-        return pd.DataFrame()
-    df = pd.read_csv(p)
-    # soft parse date-like columns
-    for c in df.columns:
-        lc = c.lower()
-        if "date" in lc or "login" in lc:
-            try:
-                df[c] = pd.to_datetime(df[c]).dt.date
-            except Exception:
-                pass
-    return df
+def _hash_checks(df: pd.DataFrame) -> str:
+    """Return a stable SHA-256 of the checks frame (sorted cols/rows) without building a CSV."""
+    h = hashlib.sha256()
+    cols = sorted(df.columns.tolist())
+    df = df[cols]
+    h.update(json.dumps(cols, default=str).encode("utf-8"))
+    h.update(b"\n")
+    # Canonical JSON per row; sort the rows so ordering in checks.json doesn't matter
+    rows = sorted(json.dumps(row, sort_keys=True, default=str) for row in df.itertuples(index=False, name=None))
+    for r in rows:
+        h.update(r.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def _check_key(check_row: Dict[str, Any], schema_context: Dict[str, List[str]]) -> str:
+    """Content address of one check: its row plus the columns of the tables it targets."""
+    target_schema = {t: schema_context.get(t, []) for t in parse_targets(check_row.get("target_table"))}
+    # Feed the parts to one hasher instead of concatenating them first (same digest as row|schema)
+    h = hashlib.sha256()
+    h.update(json.dumps(check_row, sort_keys=True, default=str).encode("utf-8"))
+    h.update(b"|")
+    h.update(json.dumps(target_schema, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _data_files() -> frozenset:
+    """Table names (basename without .csv) present in DATA_DIR, from a single directory scan."""
+    try:
+        with os.scandir(DATA_DIR) as it:
+            return frozenset(e.name[:-4] for e in it if e.is_file() and e.name.endswith(".csv"))
+    except FileNotFoundError:
+        return frozenset()
+
+
+def _csv_columns(name: str) -> List[str]:
+    """Column names of a data table, read from the CSV header only ([] if the table is absent)."""
+    if name not in _data_files():
+        return []
+    return pd.read_csv(os.path.join(DATA_DIR, f"{name}.csv"), nrows=0).columns.astype(str).tolist()
 
 
 def detect_checks_changes() -> Tuple[bool, pd.DataFrame]:
-    """Returns (changed?, checks_df). Also updates the cached CSV if changed."""
+    """
+    Returns (changed?, checks_df). Also updates the cached checks hash (and the
+    checks_last.csv snapshot) if changed.
+    """
     if not os.path.exists(CHECKS_JSON):
         raise FileNotFoundError(f"Missing {CHECKS_JSON}")
 
-    with open(CHECKS_JSON, "r", encoding="utf-8") as f:
-        checks = json.load(f)
+    checks = orjson.loads(Path(CHECKS_JSON).read_bytes())
 
     # Normalize to DataFrame
     checks_df = pd.DataFrame(checks)
-    if checks_df.empty:
-        # Create a stable empty CSV if needed
-        current_csv = "check_id\n"  # minimal
-    else:
-        current_csv = _stable_csv(checks_df)
+    current_hash = _hash_checks(checks_df)
 
-    if not os.path.exists(CHECKS_LAST_CSV):
+    if not os.path.exists(CHECKS_LAST_HASH):
         # First run: write baseline and mark as changed
-        with open(CHECKS_LAST_CSV, "w", encoding="utf-8") as f:
-            f.write(current_csv)
-        return True, checks_df
-
-    with open(CHECKS_LAST_CSV, "r", encoding="utf-8") as f:
-        last_csv = f.read()
+        changed = True
+    else:
+        last_hash = Path(CHECKS_LAST_HASH).read_text(encoding="utf-8").strip()
+        changed = current_hash != last_hash
 
-    changed = _sha256(current_csv) != _sha256(last_csv)
     if changed:
-        with open(CHECKS_LAST_CSV, "w", encoding="utf-8") as f:
-            f.write(current_csv)
+        with open(CHECKS_LAST_HASH, "w", encoding="utf-8") as f:
+            f.write(current_hash)
+    if changed or not os.path.exists(CHECKS_LAST_CSV):
+        checks_df.to_csv(CHECKS_LAST_CSV, index=False)
 
     return changed, checks_df
 
 
-def detect_schema_changes(tables: List[str]) -> Tuple[bool, Dict[str, List[str]]]:
+def detect_schema_changes(tables: List[str]) -> Tuple[bool, Dict[str, List[str]], Dict[str, List[str]]]:
     """
-    Returns (any_changed?, current_schema_cols).
+    Returns (any_changed?, current_schema_cols, previous_schema_cols).
+    previous_schema_cols is {} on first run.
     Also updates the schema cache if changed.
     """
-    current: Dict[str, List[str]] = {}
-    for t in tables:
-        df = load_csv(t)
-        current[t] = df.columns.astype(str).tolist()
+    # Only the header is needed to detect column changes; don't parse the table bodies
+    current: Dict[str, List[str]] = {t: _csv_columns(t) for t in tables}
 
     if not os.path.exists(SCHEMA_COLS_CACHE):
-        with open(SCHEMA_COLS_CACHE, "w", encoding="utf-8") as f:
-            json.dump(current, f, indent=2)
-        return True, current
+        with open(SCHEMA_COLS_CACHE, "wb", buffering=WRITE_BUFFER) as f:
+            f.write(orjson.dumps(current, option=orjson.OPT_INDENT_2))
+        return True, current, {}
 
-    with open(SCHEMA_COLS_CACHE, "r", encoding="utf-8") as f:
-        prev = json.load(f)
+    prev = orjson.loads(Path(SCHEMA_COLS_CACHE).read_bytes())
 
     changed = prev != current
     if changed:
-        with open(SCHEMA_COLS_CACHE, "w", encoding="utf-8") as f:
-            json.dump(current, f, indent=2)
+        with open(SCHEMA_COLS_CACHE, "wb", buffering=WRITE_BUFFER) as f:
+            f.write(orjson.dumps(current, option=orjson.OPT_INDENT_2))
 
-    return changed, current
+    return changed, current, prev
 
 
 def load_workflows() -> Dict[str, List[Dict[str, Any]]]:
     if not os.path.exists(WORKFLOW_CACHE):
         return {}
-    with open(WORKFLOW_CACHE, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return {}
+    try:
+        return orjson.loads(Path(WORKFLOW_CACHE).read_bytes())
+    except Exception:
+        return {}
 
 
-def save_workflows(wf: Dict[str, List[Dict[str, Any]]]) -> None:
-    with open(WORKFLOW_CACHE, "w", encoding="utf-8") as f:
-        json.dump(wf, f, indent=2)
+def _atomic_write(path: str, data: bytes) -> None:
+    # Write to a temp file and rename over the target so a crash never leaves a torn file
+    tmp = path + ".tmp"
+    with open(tmp, "wb", buffering=WRITE_BUFFER) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def sync_workflow_shards(wf: Dict[str, List[Dict[str, Any]]], changed_keys: Optional[Iterable[str]] = None) -> None:
+    """
+    Keeps one shard per check in step with `wf`: shards of `changed_keys` (default: all) and
+    missing ones are written, the rest are touched so they stay newer than workflows.json
+    (the UI ignores older shards), and shards of checks no longer in `wf` are removed.
+    """
+    os.makedirs(WORKFLOW_SHARD_DIR, exist_ok=True)
+    changed = set(wf if changed_keys is None else changed_keys)
+    live = set()
+    for k, steps in wf.items():
+        name = f"{quote(k.split('::', 1)[0], safe='')}.json"
+        if name in live:
+            continue  # same check_id under another name: the first key wins, as in the UI index
+        live.add(name)
+        path = os.path.join(WORKFLOW_SHARD_DIR, name)
+        if k in changed or not os.path.exists(path):
+            _atomic_write(path, orjson.dumps(steps))
+        else:
+            os.utime(path)
+    with os.scandir(WORKFLOW_SHARD_DIR) as it:
+        for e in it:
+            if e.name.endswith(".json") and e.name not in live:
+                os.remove(e.path)
+
+
+def save_workflows(wf: Dict[str, List[Dict[str, Any]]], changed_keys: Optional[Iterable[str]] = None) -> None:
+    """
+    Writes workflows.json, then brings the per-check shards in line with it.
+    """
+    _atomic_write(WORKFLOW_CACHE, orjson.dumps(wf))
+    sync_workflow_shards(wf, changed_keys)
 
 
 def key_for(check_row: Dict[str, Any]) -> str:
@@ -154,27 +206,46 @@ def parse_targets(target_table: Any) -> List[str]:
     return [str(target_table).strip().lower()]
 
 
+def _newest_input_mtime() -> float:
+    """Latest mtime across checks.json, DATA_DIR itself (files added/removed) and the files in it."""
+    mtimes = [os.path.getmtime(CHECKS_JSON)]
+    try:
+        mtimes.append(os.path.getmtime(DATA_DIR))
+        with os.scandir(DATA_DIR) as it:
+            mtimes.extend(e.stat().st_mtime for e in it if e.is_file())
+    except FileNotFoundError:
+        pass
+    return max(mtimes)
+
+
 # -------------------------
 # Main routine
 # -------------------------
 def main():
     print("🚀 Starting agent...")
-    # 1) Detect changes in checks.json vs cached CSV
+    # Inputs are read after this point; anything edited later must not look validated
+    run_started = time.time()
+    # 0) Fast path: no input on disk is newer than the last validated workflow cache
+    if os.path.exists(WORKFLOW_CACHE) and os.path.exists(CHECKS_JSON):
+        if os.path.getmtime(WORKFLOW_CACHE) > _newest_input_mtime():
+            print("• Nothing changed (mtime fast-path).")
+            return
+    # The data dir (and repo tree) may have changed since the last run in this process
+    _data_files.cache_clear()
+    clear_planning_context()
+    # 1) Detect changes in checks.json vs cached hash
     checks_changed, checks_df = detect_checks_changes()
     print(f"• checks.json changed? {checks_changed}")
 
     # 2) Detect schema/column changes on the observed tables
     #    Determine union of target tables from the checks registry
-    if checks_df.empty:
+    if checks_df.empty or "target_table" not in checks_df.columns:
         target_tables = []
     else:
-        all_targets = set()
-        for _, row in checks_df.iterrows():
-            for t in parse_targets(row.get("target_table")):
-                all_targets.add(t)
+        all_targets = set(checks_df["target_table"].map(parse_targets).explode().dropna().tolist())
         target_tables = sorted(all_targets)
 
-    schema_changed, current_schema = detect_schema_changes(target_tables)
+    schema_changed, current_schema, prev_schema = detect_schema_changes(target_tables)
     print(f"• schema columns changed? {schema_changed}")
 
     # 3) Load current workflows cache
@@ -189,24 +260,18 @@ def main():
         #   - schema_changed: compile checks whose target tables intersect changed tables
         changed_tables = set()
         if schema_changed:
-            # Compare current vs cached to find exactly which tables changed
-            try:
-                with open(SCHEMA_COLS_CACHE, "r", encoding="utf-8") as f:
-                    # This now contains CURRENT. We need previous to diff exactly, but we didn't retain it.
-                    # For simplicity: if schema_changed True, treat all target tables as changed.
-                    pass
-            except Exception:
-                pass
-            changed_tables = set(target_tables)
-
-        for _, row in checks_df.iterrows():
+            # Compare current vs previous snapshot to find exactly which tables changed
+            changed_tables = {t for t in target_tables if prev_schema.get(t) != current_schema.get(t)}
+
+        # to_dict("records") yields plain dicts of native Python values (no per-row Series)
+        for row in checks_df.to_dict("records"):
             targets = set(parse_targets(row.get("target_table")))
             if checks_changed:
-                checks_to_compile.append(row.to_dict())
+                checks_to_compile.append(row)
             else:
                 # Only schema changed: include check if any target table changed
                 if targets & changed_tables:
-                    checks_to_compile.append(row.to_dict())
+                    checks_to_compile.append(row)
     else:
         # Nothing changed → reuse existing workflows
         checks_to_compile = []
@@ -214,40 +279,54 @@ def main():
     # 5) Compile (generate python REPL code) for selected checks
     compiled = 0
     if checks_to_compile:
-        print(f"• Recompiling {len(checks_to_compile)} check(s)...")
         # Provide a thin "schema context" to the agent: table -> columns
         schema_context = {t: current_schema.get(t, []) for t in target_tables}
+        # checks_df is fixed for the whole loop, so hash it once (same digest as change detection)
+        checks_hash = _hash_checks(checks_df)
 
+        # Skip checks whose row and target schemas are identical to what was last compiled
+        pending: List[Tuple[Dict[str, Any], str]] = []
         for chk in checks_to_compile:
-            k = key_for(chk)
-            # Build an instruction payload for the agent
-            # The agent returns {"python_repl": "....."}
+            chk_key = _check_key(chk, schema_context)
+            prev_steps = workflows.get(key_for(chk)) or [{}]
+            if prev_steps[0].get("compiled_against", {}).get("chk_key") == chk_key:
+                continue
+            pending.append((chk, chk_key))
+        print(f"• Recompiling {len(pending)} check(s) ({len(checks_to_compile) - len(pending)} unchanged)...")
+
+        def _compile(chk: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+            # The agent returns {"plan": {...}, "execution": {...}, "python_repl": "..."}
             agent_out = use_agent(check_row=chk, schema_cols=schema_context)
-
-            workflows[k] = [
-                {
-                    "type": "plan",
-                    "artifact": agent_out.get("plan", {}),
-                    "compiled_at": datetime.datetime.now(datetime.UTC).isoformat() + "Z",
-                    "compiled_against": {
-                        "checks_hash": _sha256(_stable_csv(checks_df) if not checks_df.empty else ""),
-                        "schema_cols": schema_context
-                    }
-                },
-                {
-                    "type": "execution",
-                    "artifact": agent_out.get("execution", {}),
-                    "compiled_at": datetime.datetime.now(datetime.UTC).isoformat() + "Z",
-                    "compiled_against": {
-                        "checks_hash": _sha256(_stable_csv(checks_df) if not checks_df.empty else ""),
-                        "schema_cols": schema_context
-                    }
-                }
+            return agent_out, datetime.datetime.now(datetime.UTC).isoformat() + "Z"
+
+        results: List[Tuple[Dict[str, Any], str]] = []
+        if pending:
+            # Run the agent calls concurrently; map() keeps results in checks order
+            with ThreadPoolExecutor(max_workers=min(MAX_COMPILE_WORKERS, len(pending))) as ex:
+                results = list(ex.map(_compile, [chk for chk, _ in pending]))
+
+        for (chk, chk_key), (agent_out, compiled_at) in zip(pending, results):
+            plan_art = agent_out.get("plan", {})
+            exec_art = agent_out.get("execution", {})
+            # Both steps were compiled against the same inputs; share one (read-only) dict
+            compiled_against = {"checks_hash": checks_hash, "chk_key": chk_key, "schema_cols": schema_context}
+            workflows[key_for(chk)] = [
+                {"type": "plan", "artifact": plan_art, "compiled_at": compiled_at, "compiled_against": compiled_against},
+                {"type": "execution", "artifact": exec_art, "compiled_at": compiled_at, "compiled_against": compiled_against},
             ]
 
             compiled += 1
 
-        save_workflows(workflows)
+        if compiled > 0:
+            save_workflows(workflows, changed_keys=[key_for(chk) for chk, _ in pending])
+
+    # Mark the cache as validated against the inputs as they were when this run started
+    # (not when it finished), so edits made during a long compile still trigger the next run
+    if os.path.exists(WORKFLOW_CACHE):
+        if compiled == 0:
+            # the stamp moves forward; keep the (unchanged) shards newer than it
+            sync_workflow_shards(workflows, changed_keys=())
+        os.utime(WORKFLOW_CACHE, (run_started, run_started))
 
     # 6) If nothing changed, we can simply "use" (not execute) the cached workflows
     if compiled == 0:
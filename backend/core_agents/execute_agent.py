@@ -14,11 +14,11 @@ LangChain-powered execution agent.
 """
 
 from typing import Dict, Any, List, Optional
-import json
 import re
 import os
 
 import openai
+import orjson
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
@@ -41,6 +41,7 @@ MODEL_NAME = "gpt-4.1-mini"
 # -------- Utilities reused from your current script --------
 
 def _parse_status(stdout: str) -> str:
+    # Substring match in priority order (PASS before FAIL before ...), not first occurrence
     up = (stdout or "").upper()
     for tok in ("PASS", "FAIL", "SKIPPED", "ERROR"):
         if tok in up:
@@ -54,8 +55,8 @@ def _status_line(stdout: str) -> str:
     """
     if not stdout:
         return ""
-    lines = [ln.strip() for ln in stdout.splitlines() if ln.strip()]
-    return lines[-1] if lines else ""
+    # rstrip drops trailing blank lines, so the last line left is the last non-empty one
+    return stdout.rstrip().rsplit("\n", 1)[-1].strip()
 
 
 # -------- LangChain agent construction --------
@@ -137,9 +138,9 @@ def execute(prompt: str,
         "Goal:\n"
         f"{prompt}\n\n"
         "Context:\n"
-        f"- check_row: {json.dumps(check_row, ensure_ascii=False)}\n"
-        f"- schema_cols: {json.dumps(schema_cols, ensure_ascii=False)}\n"
-        f"- plan_artifact: {json.dumps(plan_artifact, ensure_ascii=False)}\n"
+        f"- check_row: {orjson.dumps(check_row).decode()}\n"
+        f"- schema_cols: {orjson.dumps(schema_cols).decode()}\n"
+        f"- plan_artifact: {orjson.dumps(plan_artifact).decode()}\n"
         f"- save_path (optional): {save_path or ''}\n\n"
         "Instructions:\n"
         "1) Write concrete pandas code using only declared columns and files in ./data.\n"
@@ -155,20 +156,24 @@ def execute(prompt: str,
     # Grab tool outputs cleanly from intermediate_steps
     # Each step is (AgentAction, observation). observation is whatever the tool returned.
     python_repls: List[Dict[str, Any]] = []
-    last_pandas: Optional[Dict[str, Any]] = None
     saved_json: Optional[Dict[str, Any]] = None
 
+    def _on_pandas_exec(observation: Dict[str, Any]) -> None:
+        python_repls.append({
+            "python_repl": observation.get("python_repl", ""),
+            "stdout": observation.get("stdout", ""),
+            "exit_code": int(observation.get("exit_code", -1)),
+        })
+
+    def _on_save_text(observation: Dict[str, Any]) -> None:
+        nonlocal saved_json
+        saved_json = observation
+
+    handlers = {"pandas_exec": _on_pandas_exec, "save_text": _on_save_text}
     for action, observation in result.get("intermediate_steps", []):
-        tool_name = getattr(action, "tool", "")
-        if tool_name == "pandas_exec" and isinstance(observation, dict):
-            last_pandas = observation
-            python_repls.append({
-                "python_repl": observation.get("python_repl", ""),
-                "stdout": observation.get("stdout", ""),
-                "exit_code": int(observation.get("exit_code", -1)),
-            })
-        elif tool_name == "save_text" and isinstance(observation, dict):
-            saved_json = observation
+        handler = handlers.get(getattr(action, "tool", ""))
+        if handler is not None and isinstance(observation, dict):
+            handler(observation)
 
     # If nothing captured (unexpected), fall back to final text
     final_text = result.get("output", "")
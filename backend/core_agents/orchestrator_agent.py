@@ -2,17 +2,46 @@
 Coordinates the planning and execution agents.
 
 - plan_agent.plan(...) creates structured steps and an output contract (no code execution).
-- execute_agent.execute(...) generates code, runs it in a sandboxed subprocess, and returns
-  the code blocks used and the observed result.
+- execute_agent.execute(...) generates code, runs it in a persistent sandboxed worker process,
+  and returns the code blocks used and the observed result.
 
 This file stays thin so your "agentic framework" can evolve independently.
 """
 
-from typing import Dict, Any, List
-from .plan_agent import plan
+import functools
+import threading
+from typing import Dict, Any, List, Tuple
+from .plan_agent import plan, _format_dir_tree, _ai_table_summaries, _dir_list
 from .execute_agent import execute
 
 
+_CONTEXT_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=8)
+def _planning_context(repo_root: str, schema_items: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> Tuple[str, Dict[str, Any]]:
+    schema_cols = {t: list(cols) for t, cols in schema_items}
+    return _format_dir_tree(repo_root), _ai_table_summaries(schema_cols)
+
+
+def planning_context(schema_cols: Dict[str, List[str]], repo_root: str = ".") -> Tuple[str, Dict[str, Any]]:
+    """
+    Directory tree + AI table summaries shared by every check planned against the same schema.
+    Computed once per (repo_root, schema); checks compiled in parallel wait for the first caller.
+    """
+    key = tuple((t, tuple(cols or [])) for t, cols in schema_cols.items())
+    with _CONTEXT_LOCK:
+        return _planning_context(repo_root, key)
+
+
+def clear_planning_context() -> None:
+    """
+    Drops the memoized context (call at the start of a run so new files are picked up).
+    """
+    _planning_context.cache_clear()
+    _dir_list.cache_clear()
+
+
 def orchestrate(prompt: str, check_row: Dict[str, Any], schema_cols: Dict[str, List[str]]) -> Dict[str, Any]:
     """
     Returns:
@@ -24,11 +53,14 @@ def orchestrate(prompt: str, check_row: Dict[str, Any], schema_cols: Dict[str, L
         }
       }
     """
-    # 1) Plan
+    # 1) Plan (the repo/schema context is the same for the whole batch)
+    dir_tree, ai_summaries = planning_context(schema_cols)
     planning_artifact = plan(
         prompt=prompt,
         check_row=check_row,
         schema_cols=schema_cols,
+        dir_tree=dir_tree,
+        ai_summaries=ai_summaries,
     )
 
     # 2) Execute
@@ -1,6 +1,12 @@
-import os, time, json, csv, hashlib, datetime
-from typing import Dict, Any, List, Optional
+import os, re, time, json, sqlite3, hashlib, datetime, functools, threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import quote
+import httpx
 import openai
+import numpy as np
+import orjson
+import pandas as pd
 from .utils.plan_logging import log_plan_interaction
 from dotenv import load_dotenv
 load_dotenv()
@@ -9,25 +15,58 @@ load_dotenv()
 MODEL_NAME = "gpt-5-mini"
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def _get_openai_client():
+@functools.lru_cache(maxsize=1)
+def _get_openai_client() -> openai.OpenAI:
     """
-    Returns an OpenAI client instance.
+    Returns the shared OpenAI client instance, created on first use.
     Assumes you have set the OPENAI_API_KEY environment variable.
+    One pooled httpx client keeps TLS connections alive across planner calls.
     """
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    return openai
+    return openai.OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.Client(
+            timeout=60.0,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        ),
+    )
 
 
-def chat_with_AI(prompt_msgs, model=MODEL_NAME, temperature=1):
+LLM_CACHE_DIR = "cached_mem/llm_cache"
+PLAN_CACHE_TTL = 24 * 3600  # seconds
+
+
+def _llm_cache_key(prompt_msgs, model) -> str:
+    payload = orjson.dumps({"model": model, "msgs": prompt_msgs}, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _stream_content(client, model, prompt_msgs) -> str:
+    # Collect the streamed deltas; the body is consumed as it arrives instead of in one read at the end
+    parts: List[str] = []
+    for chunk in client.chat.completions.create(model=model, messages=prompt_msgs, stream=True):
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+    return "".join(parts)
+
+
+# Identical requests already on the wire: cache key -> Future of the response text
+_INFLIGHT: Dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _complete(prompt_msgs, model, stream: bool) -> str:
     """
-    Chat function used to interact with the agent.
-    Retries with exponential backoff. Caller handles parsing.
+    One API request with retries and exponential backoff.
     """
-    # client = _get_openai_client()
+    client = _get_openai_client()
     delay = 1.5
     for _ in range(3):
         try:
-            rsp = openai.chat.completions.create(
+            if stream:
+                return _stream_content(client, model, prompt_msgs)
+            rsp = client.chat.completions.create(
                 model=model,
                 messages=prompt_msgs,
                 # temperature=temperature,
@@ -40,6 +79,61 @@ def chat_with_AI(prompt_msgs, model=MODEL_NAME, temperature=1):
     raise RuntimeError("LLM failed 3 ×")
 
 
+def chat_with_AI(
+    prompt_msgs,
+    model=MODEL_NAME,
+    temperature=1,
+    cache_ttl: Optional[float] = PLAN_CACHE_TTL,
+    stream: bool = False,
+):
+    """
+    Chat function used to interact with the agent.
+    Retries with exponential backoff. Caller handles parsing.
+    Responses are cached on disk by (model, messages) for `cache_ttl` seconds
+    (None = never expires, 0 = bypass the cache).
+    Concurrent identical requests share a single API call.
+    With stream=True the response is streamed and joined before returning.
+    """
+    key = _llm_cache_key(prompt_msgs, model)
+    cache_file = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+
+    def _cached() -> Optional[str]:
+        if cache_ttl == 0:
+            return None
+        hit = _load_json(cache_file, default=None)
+        if hit and (cache_ttl is None or time.time() - hit.get("created", 0) < cache_ttl):
+            return hit["content"]
+        return None
+
+    content = _cached()
+    if content is not None:
+        return content
+
+    with _INFLIGHT_LOCK:
+        pending = _INFLIGHT.get(key)
+        if pending is None:
+            fut = _INFLIGHT[key] = Future()
+    if pending is not None:
+        return pending.result()
+
+    try:
+        # Probe again now that this call owns the slot: an identical request may have
+        # finished (and been cached) between the first miss and the registration above
+        content = _cached()
+        if content is None:
+            content = _complete(prompt_msgs, model, stream)
+            if cache_ttl != 0:
+                _save_json(cache_file, {"model": model, "created": time.time(), "content": content})
+        fut.set_result(content)
+        return content
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+
+
 # ----------------------------
 # Utilities
 # ----------------------------
@@ -50,27 +144,54 @@ def _ensure_dir(p: str) -> None:
 
 def _load_json(path: str, default):
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     except Exception:
         return default
 
 
 def _save_json(path: str, obj) -> None:
+    """
+    Atomic write (tmp file + os.replace); skipped when the file already holds the same bytes.
+    """
+    data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return
+    except OSError:
+        pass
     _ensure_dir(os.path.dirname(path))
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, indent=2, ensure_ascii=False)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# Skip venvs and .git to keep it clean. cached_mem holds the agent's own state (LLM cache,
+# summary store, shards): listing it would change the plan prompt, and its cache key, on every run.
+_SKIP_DIRS = frozenset({".git", ".venv", "venv", "__pycache__", "node_modules", "cached_mem"})
 
 
-def _dir_list(root: str = ".") -> List[str]:
+@functools.lru_cache(maxsize=8)
+def _dir_list(root: str = ".") -> Tuple[str, ...]:
     paths = []
-    for base, _, files in os.walk(root):
-        # Skip venvs and .git to keep it clean
-        if any(skip in base for skip in (".git", ".venv", "venv", "__pycache__")):
+    stack = [root]
+    while stack:
+        base = stack.pop()
+        try:
+            with os.scandir(base) as it:
+                for e in it:
+                    if e.is_dir():
+                        # Prune at the directory itself so skipped subtrees are never scanned
+                        if e.name not in _SKIP_DIRS and not e.is_symlink():
+                            stack.append(e.path)
+                    else:
+                        paths.append(e.path)
+        except OSError:
             continue
-        for f in files:
-            paths.append(os.path.join(base, f))
-    return sorted(paths)
+    return tuple(sorted(paths))
 
 
 def _format_dir_tree(root: str = ".") -> str:
@@ -87,73 +208,101 @@ def _format_dir_tree(root: str = ".") -> str:
 def _read_csv_head(csv_path: str, n: int = 100) -> Dict[str, Any]:
     """
     Read header and up to n rows from a CSV, returning simple profiling info.
-    No pandas dependency.
+    Profiles are memoized per file version (mtime + size); treat the result as read-only.
+    """
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return {"columns": [], "rows_read": 0, "samples_by_col": {}, "distinct_counts": {}}
+    return _profile_csv_head(csv_path, st.st_mtime_ns, st.st_size, n)
+
+
+@functools.lru_cache(maxsize=64)
+def _profile_csv_head(csv_path: str, mtime_ns: int, size: int, n: int) -> Dict[str, Any]:
+    """
+    Uses pandas' C parser (nrows=n, all values as raw strings) and profiles column-wise.
+    mtime_ns/size are only part of the cache key.
     """
     out = {"columns": [], "rows_read": 0, "samples_by_col": {}, "distinct_counts": {}}
-    if not os.path.exists(csv_path):
+    try:
+        df = pd.read_csv(csv_path, nrows=n, dtype=str, keep_default_na=False, encoding="utf-8")
+    except pd.errors.EmptyDataError:
         return out
-
-    with open(csv_path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        cols = list(reader.fieldnames or [])
-        out["columns"] = cols
-        # gather up to 4 examples and distinct counts (bounded)
-        examples = {c: [] for c in cols}
-        seen = {c: set() for c in cols}
-        limit = max(50, n)  # bound for distinct sampling
-        for i, row in enumerate(reader):
-            if i >= n:
-                break
-            out["rows_read"] += 1
-            for c in cols:
-                v = row.get(c, "")
-                if len(examples[c]) < 4 and v not in examples[c]:
-                    examples[c].append(v)
-                if len(seen[c]) < limit:
-                    seen[c].add(v)
-        out["samples_by_col"] = examples
-        out["distinct_counts"] = {c: len(seen[c]) for c in cols}
+    df = df.fillna("")  # short rows still come back as NaN
+
+    cols = [str(c) for c in df.columns]
+    out["columns"] = cols
+    out["rows_read"] = len(df)
+    # up to 4 examples (first distinct values, in file order) and distinct counts (bounded)
+    limit = max(50, n)  # bound for distinct sampling
+    for c, name in zip(df.columns, cols):
+        uniq = pd.unique(df[c].to_numpy())
+        out["samples_by_col"][name] = uniq[:4].tolist()
+        out["distinct_counts"][name] = min(len(uniq), limit)
     return out
 
 
-def _guess_type(samples: List[str]) -> str:
+# Same grammar float() accepts (signs, underscores, exponents, inf/nan), matched in C
+_DIGITPART = r"\d(?:_?\d)*"
+_FLOAT_RE = re.compile(
+    rf"[+-]?(?:(?:{_DIGITPART}(?:\.(?:{_DIGITPART})?)?|\.{_DIGITPART})(?:[eE][+-]?{_DIGITPART})?|inf(?:inity)?|nan)",
+    re.IGNORECASE,
+)
+_DATE_SEPS = ("-", "/", ":")
+_DATE_HINTS = ("202", "19", "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+
+
+def _contains_any(arr: np.ndarray, needles) -> np.ndarray:
+    hit = np.zeros(arr.shape, dtype=bool)
+    for k in needles:
+        hit |= np.char.find(arr, k) >= 0
+    return hit
+
+
+def _guess_types(samples_per_col: List[List[str]]) -> List[str]:
     """
-    Tiny type guesser for prompt context.
+    Tiny type guesser for prompt context, for many columns at once.
+    All sample cells are classified in one flat array; counts are reduced back per column.
     """
-    if not samples:
-        return "unknown"
-    digits, floats, dates = 0, 0, 0
-    for s in samples[:8]:
-        s2 = (s or "").strip()
-        if s2.isdigit():
-            digits += 1
-            continue
-        try:
-            float(s2)
-            floats += 1
-            continue
-        except Exception:
-            pass
-        # very rough date sniff
-        if any(ch in s2 for ch in ("-", "/", ":")) and any(k in s2.lower() for k in ("202", "19", "jan", "feb", "mar", "apr",
-                                                                                      "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")):
-            dates += 1
-    if dates >= max(digits, floats, 1):
-        return "date/datetime-like"
-    if digits > floats and digits >= 2:
-        return "integer-like"
-    if floats >= 2:
-        return "float-like"
-    return "text/mixed"
+    n_cols = len(samples_per_col)
+    cells = [(s or "").strip() for samples in samples_per_col for s in samples[:8]]
+    if not cells:
+        return ["unknown"] * n_cols
+    col_idx = np.repeat(np.arange(n_cols), [min(len(samples), 8) for samples in samples_per_col])
+    arr = np.array(cells, dtype=str)
+
+    is_digit = np.char.isdigit(arr)
+    is_float = ~is_digit & np.fromiter((_FLOAT_RE.fullmatch(c) is not None for c in cells), dtype=bool, count=len(cells))
+    # very rough date sniff
+    is_date = ~is_digit & ~is_float & _contains_any(arr, _DATE_SEPS) & _contains_any(np.char.lower(arr), _DATE_HINTS)
+
+    digits = np.bincount(col_idx, weights=is_digit, minlength=n_cols)
+    floats = np.bincount(col_idx, weights=is_float, minlength=n_cols)
+    dates = np.bincount(col_idx, weights=is_date, minlength=n_cols)
+
+    out = []
+    for samples, d, f, dt in zip(samples_per_col, digits, floats, dates):
+        if not samples:
+            out.append("unknown")
+        elif dt >= max(d, f, 1):
+            out.append("date/datetime-like")
+        elif d > f and d >= 2:
+            out.append("integer-like")
+        elif f >= 2:
+            out.append("float-like")
+        else:
+            out.append("text/mixed")
+    return out
 
 
 def _column_cards(head_info: Dict[str, Any]) -> List[Dict[str, Any]]:
     cards = []
-    for c in head_info.get("columns", []):
-        ex = head_info["samples_by_col"].get(c, [])
+    cols = head_info.get("columns", [])
+    examples = [head_info["samples_by_col"].get(c, []) for c in cols]
+    for c, ex, type_guess in zip(cols, examples, _guess_types(examples)):
         cards.append({
             "name": c,
-            "type_guess": _guess_type(ex),
+            "type_guess": type_guess,
             "examples": ex,
             "distinct_count_sampled": head_info["distinct_counts"].get(c, 0),
         })
@@ -161,14 +310,167 @@ def _column_cards(head_info: Dict[str, Any]) -> List[Dict[str, Any]]:
 
 
 def _hash_schema(cols: List[str]) -> str:
+    # Non-cryptographic fingerprint; blake2b with an 8-byte digest is the fastest option in hashlib
     s = "|".join(cols)
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=8).hexdigest()
 
 
 # ----------------------------
 # AI Table Summaries (cached)
 # ----------------------------
 
+SUMMARY_WORKERS = 8
+
+
+_SUMMARY_SYSTEM = (
+    "You are a data analyst. Given a table description (columns, example values, distinct counts), "
+    "write a concise 2–3 sentence summary describing entity type, keys, likely joins, and any quality flags. "
+    "Keep it under 80 words. Do NOT invent columns."
+)
+
+
+def _table_card(table: str, cols: List[str], data_dir: str) -> Dict[str, Any]:
+    """
+    Compact “table card” sent to the LLM: declared columns + a profile of the file head.
+    """
+    csv_path = os.path.join(data_dir, f"{table}.csv")
+    head_info = _read_csv_head(csv_path, n=100)
+    return {
+        "table_name": table,
+        "columns_declared": cols,
+        "profile": {
+            "rows_sampled": head_info.get("rows_read", 0),
+            "columns": _column_cards(head_info)
+        }
+    }
+
+
+def _summary_entry(cols: List[str], llm_text: str) -> Dict[str, Any]:
+    return {
+        "columns": cols,
+        "schema_hash": _hash_schema(cols),
+        "summary": llm_text.strip(),
+        "llm_model": MODEL_NAME,
+        "updated_at": datetime.datetime.utcnow().isoformat() + "Z",
+    }
+
+
+def _summarize_one(table: str, cols: List[str], data_dir: str) -> Dict[str, Any]:
+    """
+    Profiles one table and asks the LLM for its summary. Returns the cache entry.
+    """
+    sys = {"role": "system", "content": _SUMMARY_SYSTEM}
+    usr = {"role": "user", "content": orjson.dumps(_table_card(table, cols, data_dir)).decode()}
+
+    try:
+        # Summaries are already keyed on the schema hash, so their responses never expire
+        llm_text = chat_with_AI([sys, usr], model=MODEL_NAME, temperature=0, cache_ttl=None)
+    except Exception as e:
+        print(f"[AI summary] Error for table '{table}': {e}")
+        llm_text = f"Table '{table}' with columns: {', '.join(cols)}. (Fallback summary; LLM unavailable [AI summary error]: {e})"
+
+    return _summary_entry(cols, llm_text)
+
+
+def _summarize_batch(missing: Dict[str, List[str]], data_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Asks for all missing summaries in one LLM call (one round-trip, system prompt sent once).
+    Returns the cache entries it could parse; tables left out are for the caller to retry per table.
+    """
+    sys = {
+        "role": "system",
+        "content": _SUMMARY_SYSTEM + " You will receive several tables. Return ONLY a JSON object "
+                   "mapping each table_name to its summary string."
+    }
+    usr = {
+        "role": "user",
+        "content": orjson.dumps({"tables": [_table_card(t, cols, data_dir) for t, cols in missing.items()]}).decode()
+    }
+    try:
+        raw = chat_with_AI([sys, usr], model=MODEL_NAME, temperature=0, cache_ttl=None)
+        clean = raw.strip()
+        if clean.startswith("```"):
+            nl = clean.find("\n")
+            clean = clean[nl + 1:] if nl != -1 else clean[3:]
+            if clean.endswith("```"):
+                clean = clean[:-3]
+        parsed = json.loads(clean)
+    except Exception as e:
+        print(f"[AI summary] Batched summary failed → per-table calls. Details: {e}")
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+
+    return {
+        t: _summary_entry(cols, parsed[t])
+        for t, cols in missing.items()
+        if isinstance(parsed.get(t), str) and parsed[t].strip()
+    }
+
+
+# Summaries live in SQLite (WAL) next to the legacy JSON file: per-table lookups and upserts,
+# readers never block the writer. The UI reads one JSON shard per table
+# (ai_table_summaries/<table>.json), written only for tables whose summary changed.
+# One connection per cache path, shared across threads; every use is serialized by the lock.
+_SUMMARY_DB_LOCK = threading.Lock()
+_SUMMARY_DBS: Dict[str, sqlite3.Connection] = {}
+
+
+def _summary_shard_path(cache_path: str, table: str) -> str:
+    return os.path.join(os.path.splitext(cache_path)[0], f"{quote(table, safe='')}.json")
+
+
+def _open_summary_db(cache_path: str) -> sqlite3.Connection:
+    db_path = os.path.splitext(cache_path)[0] + ".sqlite"
+    _ensure_dir(os.path.dirname(db_path))
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS summaries("
+        "table_name TEXT PRIMARY KEY, schema_hash TEXT, summary TEXT, "
+        "model TEXT, updated_at TEXT, columns_json TEXT)"
+    )
+    # One-time import of the legacy JSON cache (and its shards for the UI)
+    if conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0] == 0:
+        legacy = _load_json(cache_path, default={})
+        if isinstance(legacy, dict) and legacy:
+            _upsert_summaries(conn, legacy)
+            for t, entry in legacy.items():
+                _save_json(_summary_shard_path(cache_path, t), entry)
+    conn.commit()
+    return conn
+
+
+def _summary_db(cache_path: str) -> sqlite3.Connection:
+    with _SUMMARY_DB_LOCK:
+        conn = _SUMMARY_DBS.get(cache_path)
+        if conn is None:
+            conn = _SUMMARY_DBS[cache_path] = _open_summary_db(cache_path)
+        return conn
+
+
+def _upsert_summaries(conn: sqlite3.Connection, entries: Dict[str, Dict[str, Any]]) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (t, e.get("schema_hash"), e.get("summary"), e.get("llm_model"), e.get("updated_at"),
+             orjson.dumps(e.get("columns") or []).decode())
+            for t, e in entries.items()
+        ],
+    )
+
+
+def _select_summaries(conn: sqlite3.Connection, tables: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    sql = "SELECT table_name, schema_hash, summary, model, updated_at, columns_json FROM summaries"
+    if tables is not None:
+        sql += f" WHERE table_name IN ({','.join('?' * len(tables))})"
+    return {
+        t: {"columns": orjson.loads(cols), "schema_hash": h, "summary": summary,
+            "llm_model": model, "updated_at": updated}
+        for t, h, summary, model, updated, cols in conn.execute(sql, tables or ())
+    }
+
+
 def _ai_table_summaries(
     schema_cols: Dict[str, List[str]],
     data_dir: str = "data",
@@ -177,6 +479,8 @@ def _ai_table_summaries(
     """
     Uses the LLM to generate short natural-language summaries of tables.
     Caches by (table, column schema). If schema unchanged, reuses cache.
+    Tables missing from the cache are summarized in one batched call; any the
+    batch did not cover are summarized concurrently, one call per table.
 
     Returns:
       {
@@ -190,63 +494,42 @@ def _ai_table_summaries(
         ...
       }
     """
-    cache = _load_json(cache_path, default={})
+    conn = _summary_db(cache_path)
+    with _SUMMARY_DB_LOCK:
+        cache = _select_summaries(conn, list(schema_cols)) if schema_cols else {}
     out: Dict[str, Dict[str, Any]] = {}
+    missing: Dict[str, List[str]] = {}
 
     for table, cols in schema_cols.items():
         cols = list(cols or [])
-        new_hash = _hash_schema(cols)
-
         cached = cache.get(table)
-        if cached and cached.get("schema_hash") == new_hash and cached.get("summary"):
+        if cached and cached.get("schema_hash") == _hash_schema(cols) and cached.get("summary"):
             # reuse cached
             out[table] = cached
-            continue
-
-        # Build compact “table card”
-        csv_path = os.path.join(data_dir, f"{table}.csv")
-        head_info = _read_csv_head(csv_path, n=100)
-        col_cards = _column_cards(head_info)
-
-        sys = {
-            "role": "system",
-            "content": (
-                "You are a data analyst. Given a table description (columns, example values, distinct counts), "
-                "write a concise 2–3 sentence summary describing entity type, keys, likely joins, and any quality flags. "
-                "Keep it under 80 words. Do NOT invent columns."
-            )
-        }
-        usr = {
-            "role": "user",
-            "content": json.dumps({
-                "table_name": table,
-                "columns_declared": cols,
-                "profile": {
-                    "rows_sampled": head_info.get("rows_read", 0),
-                    "columns": col_cards
-                }
-            }, ensure_ascii=False)
-        }
-
-        try:
-            llm_text = chat_with_AI([sys, usr], model=MODEL_NAME, temperature=0)
-        except Exception as e:
-            print(f"[AI summary] Error for table '{table}': {e}")
-            llm_text = f"Table '{table}' with columns: {', '.join(cols)}. (Fallback summary; LLM unavailable [AI summary error]: {e})"
-
-        out[table] = {
-            "columns": cols,
-            "schema_hash": new_hash,
-            "summary": llm_text.strip(),
-            "llm_model": MODEL_NAME,
-            "updated_at": datetime.datetime.utcnow().isoformat() + "Z",
-        }
-
-    # persist merged cache (keep other tables if present)
-    merged = dict(cache)
-    merged.update(out)
-    _save_json(cache_path, merged)
-    return out
+        else:
+            missing[table] = cols
+
+    fresh: Dict[str, Dict[str, Any]] = {}
+    if len(missing) > 1:
+        fresh = _summarize_batch(missing, data_dir)
+    rest = {t: cols for t, cols in missing.items() if t not in fresh}
+    if rest:
+        # Each summary is an independent, network-bound LLM call
+        with ThreadPoolExecutor(max_workers=min(SUMMARY_WORKERS, len(rest))) as ex:
+            futures = {ex.submit(_summarize_one, t, cols, data_dir): t for t, cols in rest.items()}
+            for fut in as_completed(futures):
+                fresh[futures[fut]] = fut.result()
+
+    if fresh:
+        with _SUMMARY_DB_LOCK:
+            with conn:
+                _upsert_summaries(conn, fresh)
+        # only the changed tables' shards are rewritten (no full-store export)
+        for t, entry in fresh.items():
+            _save_json(_summary_shard_path(cache_path, t), entry)
+
+    # keep the caller's table order
+    return {t: out.get(t) or fresh[t] for t in schema_cols}
 
 
 # ----------------------------
@@ -272,6 +555,8 @@ def plan(
     check_row: Dict[str, Any],
     schema_cols: Dict[str, List[str]],
     repo_root: str = ".",
+    dir_tree: Optional[str] = None,
+    ai_summaries: Optional[Dict[str, Dict[str, Any]]] = None,
 ) -> Dict[str, Any]:
     """
     Creates a model-generated structured plan using:
@@ -280,19 +565,22 @@ def plan(
       - AI table summaries (from cache or fresh),
       - declared schema_cols.
 
+    dir_tree / ai_summaries can be passed in when planning a batch of checks;
+    they are computed here only when omitted.
     If the model returns invalid JSON, falls back to a deterministic artifact.
     """
     targets = [s.strip() for s in str(check_row.get("target_table", "")).split(",") if s.strip()]
-    dir_tree = _format_dir_tree(repo_root)
-    ai_summaries = _ai_table_summaries(schema_cols)
+    if dir_tree is None:
+        dir_tree = _format_dir_tree(repo_root)
+    if ai_summaries is None:
+        ai_summaries = _ai_table_summaries(schema_cols)
 
-    # Build strict JSON contract for the model to fill
+    # Build strict JSON contract for the model to fill (the bulky repo/schema context lives
+    # in the shared system message only, not in every per-check message)
     contract = {
         "check_id": check_row.get("check_id"),
         "check_name": check_row.get("check_name"),
         "targets": targets,
-        "ai_table_summaries": ai_summaries,  # model may reference but must not alter
-        "dir_list": dir_tree.splitlines(),
         "steps": "LLM_TO_FILL",
         "output_contract": {
             "format": "single_line",
@@ -309,26 +597,31 @@ def plan(
             "- Return ONLY JSON (no prose).\n"
             "- Each step MUST include: {step:int, action:str, notes:str, inputs?:object, outputs?:object}.\n"
             "- Prefer these actions when relevant: load_tables, transform, compute_metrics, validate, decide_status, emit_summary, write_artifact.\n"
-            "- Use provided ai_table_summaries and dir_list to ground paths and column names; do not invent columns.\n"
+            "- Use the shared ai_table_summaries and dir_tree below to ground paths and column names; do not invent columns.\n"
             "- If multiple tables are needed, list them in 'inputs'.\n"
-            "- Keep to ~4–8 steps."
+            "- Keep to ~4–8 steps.\n"
+            "Shared context (same for every check in this run):\n"
+            + orjson.dumps({
+                "schema_cols_declared": schema_cols,
+                "dir_tree": dir_tree,
+                "ai_table_summaries": ai_summaries,
+            }).decode()
         )
     }
+    # Only the per-check part goes after the shared prefix, so the provider can reuse its prompt cache
     usr = {
         "role": "user",
-        "content": json.dumps({
+        "content": orjson.dumps({
             "goal_prompt": prompt,
             "check_row": check_row,
-            "schema_cols_declared": schema_cols,
-            "dir_tree": dir_tree,
-            "ai_table_summaries": ai_summaries,
+            "context": "dir_tree, schema_cols_declared and ai_table_summaries are in the system message",
             "return_json_shape": contract
-        }, ensure_ascii=False)
+        }).decode()
     }
 
     plan_obj: Optional[Dict[str, Any]] = None
     try:
-        raw = chat_with_AI([sys, usr], model=MODEL_NAME, temperature=0)
+        raw = chat_with_AI([sys, usr], model=MODEL_NAME, temperature=0, stream=True)
         log_plan_interaction(
             check_id=str(check_row.get("check_id") or ""),
             model=MODEL_NAME,
@@ -347,6 +640,7 @@ def plan(
             # could be like ```json ... ```
             if "\n" in clean:
                 clean = "\n".join(clean.split("\n")[1:-1]).strip()
+        # stdlib json stays here: it is more tolerant of what the model returns (e.g. NaN)
         plan_obj = json.loads(clean)
     except Exception as e:
         print(f"[plan] JSON parse failed or LLM error → fallback. Details: {e}")
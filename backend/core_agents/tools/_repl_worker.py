@@ -0,0 +1,148 @@
+# tools/_repl_worker.py
+"""
+Long-lived Python worker behind pandas_exec.
+
+Reads length-prefixed code blocks on stdin (4-byte big-endian size + UTF-8 source),
+runs each in a fresh namespace, and answers with a length-prefixed JSON frame
+{"stdout", "stderr", "exit_code"} on the original stdout.
+Interpreter and pandas start-up are paid once per worker instead of once per call;
+cwd, os.environ, sys.path and pandas options are restored after every block, so calls
+don't see each other's process state. The one thing deliberately shared is the parsed-CSV
+cache behind pd.read_csv (see _cached_read_csv).
+"""
+import io
+import os
+import sys
+import json
+import warnings
+import traceback
+import contextlib
+
+try:
+    import pandas  # (warm import for the generated code)
+except Exception:
+    pandas = None
+
+# Parsed CSVs shared by the blocks this worker runs: (abspath, mtime_ns, size, kwargs) -> DataFrame
+_ORIG_READ_CSV = pandas.read_csv if pandas is not None else None
+_CSV_CACHE: dict = {}
+
+
+def _read_exact(f, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = f.read(n - len(buf))
+        if not chunk:
+            raise EOFError
+        buf += chunk
+    return buf
+
+
+def _run(code: str):
+    out, err = io.StringIO(), io.StringIO()
+    exit_code = 0
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            exec(compile(code, "<pandas_exec>", "exec"), {"__name__": "__main__"})
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                exit_code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+    return out.getvalue(), err.getvalue(), exit_code
+
+
+def _cached_read_csv(filepath_or_buffer, *args, **kwargs):
+    """
+    pd.read_csv stand-in: the same file read with the same options is parsed once and
+    handed out as a copy until its mtime/size changes.
+    """
+    if args or not isinstance(filepath_or_buffer, (str, os.PathLike)) or kwargs.get("chunksize") or kwargs.get("iterator"):
+        return _ORIG_READ_CSV(filepath_or_buffer, *args, **kwargs)
+    path = os.path.abspath(filepath_or_buffer)
+    try:
+        st = os.stat(path)
+    except OSError:
+        # URLs, missing files, ...: let pandas handle (and report) it
+        return _ORIG_READ_CSV(filepath_or_buffer, **kwargs)
+    key = (path, st.st_mtime_ns, st.st_size, repr(sorted(kwargs.items())))
+    df = _CSV_CACHE.get(key)
+    if df is None:
+        df = _ORIG_READ_CSV(path, **kwargs)
+        # forget older versions of this file
+        for stale in [k for k in _CSV_CACHE if k[0] == path]:
+            del _CSV_CACHE[stale]
+        _CSV_CACHE[key] = df
+    # generated code may mutate its frame; never hand out the cached one
+    return df.copy()
+
+
+def _pandas_options(node=None, prefix: str = "") -> dict:
+    """
+    Flat {"display.max_rows": value, ...} snapshot, walked through the public pd.options tree.
+    """
+    if pandas is None:
+        return {}
+    node = pandas.options if node is None else node
+    out = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # deprecated options warn on access
+        for name in dir(node):
+            val = getattr(node, name)
+            if isinstance(val, type(pandas.options)):
+                out.update(_pandas_options(val, f"{prefix}{name}."))
+            else:
+                out[f"{prefix}{name}"] = val
+    return out
+
+
+def _reset(cwd: str, env: dict, path: list, options: dict) -> None:
+    os.chdir(cwd)
+    if os.environ != env:
+        os.environ.clear()
+        os.environ.update(env)
+    sys.path[:] = path
+    if pandas is not None:
+        pandas.read_csv = _cached_read_csv  # in case a block replaced it
+    # only touch options that changed (resetting all of them fires every option callback)
+    changed = {k: options[k] for k, v in _pandas_options().items() if k in options and v != options[k]}
+    if changed:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for k, v in changed.items():
+                pandas.set_option(k, v)
+
+
+def main() -> None:
+    # Keep the protocol channel private: anything else writing to fd 1 lands on stderr
+    proto = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    sys.stdout = io.TextIOWrapper(os.fdopen(1, "wb", closefd=False), line_buffering=True)
+    stdin = sys.stdin.buffer
+    # Same import behaviour as `python -c`: the working directory comes first
+    sys.path[0] = ""
+    if pandas is not None:
+        pandas.read_csv = _cached_read_csv
+    start = (os.getcwd(), dict(os.environ), list(sys.path), _pandas_options())
+
+    while True:
+        try:
+            size = int.from_bytes(_read_exact(stdin, 4), "big")
+            code = _read_exact(stdin, size).decode("utf-8")
+        except EOFError:
+            return
+        try:
+            stdout, stderr, exit_code = _run(code)
+        finally:
+            _reset(*start)
+        frame = json.dumps({"stdout": stdout, "stderr": stderr, "exit_code": exit_code}).encode("utf-8")
+        proto.write(len(frame).to_bytes(4, "big") + frame)
+        proto.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,24 @@
 # tools/dataframe_tool.py
 import os
 import sys
-import re
+import json
+import time
+import atexit
+import select
+import threading
 import subprocess
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Set, Tuple
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
 
+REPL_TIMEOUT = 90  # seconds
+
 def _strip_fences(code: str) -> str:
     s = code.strip()
     if s.startswith("```"):
-        s = re.sub(r"^```[\w+-]*\n", "", s)  # drop opening fence
+        nl = s.find("\n")
+        s = s[nl + 1:] if nl != -1 else s[3:]  # drop opening fence (and its language tag)
         if s.endswith("```"):
             s = s[:-3]
     return s
@@ -26,7 +33,99 @@ def _find_project_root(start: Path) -> Path:
             return p
     return start
 
+# Generated code runs in persistent worker processes per (cwd, DATA_DIR), fed over stdin/stdout.
+# Each call checks a worker out of an idle pool (spawning one if none is free), so checks
+# compiled in parallel run side by side instead of queueing behind a single process.
+MAX_IDLE_WORKERS = 8  # per (cwd, DATA_DIR); matches the agent's compile pool
+_WORKER_SCRIPT = str(Path(__file__).with_name("_repl_worker.py"))
+_IDLE: Dict[Tuple[str, str], List[subprocess.Popen]] = {}
+_LIVE: Set[subprocess.Popen] = set()
+_WORKER_LOCK = threading.Lock()  # guards _IDLE/_LIVE only, never held while code runs
+
+def _spawn_worker(root: Path, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-u", _WORKER_SCRIPT],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,   # per-call stderr comes back in the response frame
+        cwd=str(root),
+        env=env,
+    )
+
+def _kill_worker(proc: subprocess.Popen) -> None:
+    with _WORKER_LOCK:
+        _LIVE.discard(proc)
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+
+@atexit.register
+def _shutdown_workers() -> None:
+    with _WORKER_LOCK:
+        procs = list(_LIVE)
+    for proc in procs:
+        _kill_worker(proc)
+
+def _checkout_worker(key: Tuple[str, str], root: Path, env: Dict[str, str]) -> subprocess.Popen:
+    with _WORKER_LOCK:
+        idle = _IDLE.get(key, [])
+        while idle:
+            proc = idle.pop()
+            if proc.poll() is None:
+                return proc
+            _LIVE.discard(proc)
+    proc = _spawn_worker(root, env)
+    with _WORKER_LOCK:
+        _LIVE.add(proc)
+    return proc
+
+def _checkin_worker(key: Tuple[str, str], proc: subprocess.Popen) -> None:
+    with _WORKER_LOCK:
+        idle = _IDLE.setdefault(key, [])
+        if len(idle) < MAX_IDLE_WORKERS:
+            idle.append(proc)
+            return
+    _kill_worker(proc)
+
+def _read_frame(fd: int, n: int, deadline: float) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+            raise TimeoutError(f"timed out after {REPL_TIMEOUT} seconds")
+        chunk = os.read(fd, n - len(buf))
+        if not chunk:
+            raise EOFError("worker exited")
+        buf += chunk
+    return buf
+
+def _run_in_worker(clean: str, root: Path, env: Dict[str, str]) -> Tuple[str, str, int]:
+    """
+    Sends one code block to a pooled worker and waits for its reply.
+    On timeout or a dead worker the process is killed; the pool spawns a fresh one when needed.
+    """
+    key = (str(root), env["DATA_DIR"])
+    payload = clean.encode("utf-8")
+    proc = _checkout_worker(key, root, env)
+    try:
+        proc.stdin.write(len(payload).to_bytes(4, "big") + payload)
+        proc.stdin.flush()
+        deadline = time.monotonic() + REPL_TIMEOUT
+        fd = proc.stdout.fileno()
+        size = int.from_bytes(_read_frame(fd, 4, deadline), "big")
+        frame = json.loads(_read_frame(fd, size, deadline))
+    except (OSError, EOFError, TimeoutError, ValueError) as e:
+        _kill_worker(proc)
+        return "", f"{type(e).__name__}: {e}", -1
+    _checkin_worker(key, proc)
+    return frame["stdout"], frame["stderr"], frame["exit_code"]
+
+
 def _run_python_repl(code: str, desired_root: str | None = None) -> Dict[str, Any]:
+    """
+    Runs generated code with cwd at a folder containing ./data, in an isolated
+    subprocess (a persistent worker, reused across calls).
+    """
     # Resolve a stable cwd that contains ./data
     here = Path(__file__).resolve().parent
     root = Path(desired_root).resolve() if desired_root else _find_project_root(here)
@@ -36,20 +135,12 @@ def _run_python_repl(code: str, desired_root: str | None = None) -> Dict[str, An
 
     clean = _strip_fences(code)
 
-    cmd = [sys.executable, "-c", clean]
     try:
-        proc = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=90,
-            cwd=str(root),     # <— key change
-            env=env,
-        )
+        stdout, stderr, exit_code = _run_in_worker(clean, root, env)
         return {
-            "stdout": (proc.stdout or "").strip(),
-            "stderr": (proc.stderr or "").strip(),
-            "exit_code": proc.returncode,
+            "stdout": stdout.strip(),
+            "stderr": stderr.strip(),
+            "exit_code": exit_code,
             "python_repl": code,       # keep original for logging
             "cwd": str(root),
             "data_dir": env["DATA_DIR"]
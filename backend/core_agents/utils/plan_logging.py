@@ -1,12 +1,63 @@
 # utils/plan_logging.py
-import os, json, datetime
-from typing import List, Dict, Any, Optional
+import os, datetime, queue, atexit, threading
+import orjson
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO
 
 PLAN_LOG_PATH = "cached_mem/plan_prompt_log.jsonl"
 
+# Records are appended by a background writer: callers enqueue and return immediately,
+# the writer keeps one open handle per log file and flushes after each drained batch.
+_LOG_QUEUE: "queue.Queue[Tuple[str, bytes]]" = queue.Queue()
+_WRITER: Optional[threading.Thread] = None
+_WRITER_LOCK = threading.Lock()
+
 def _ensure_dir(p: str) -> None:
     os.makedirs(os.path.dirname(p), exist_ok=True)
 
+def _writer_loop() -> None:
+    handles: Dict[str, BinaryIO] = {}
+    while True:
+        batch = [_LOG_QUEUE.get()]
+        while True:
+            try:
+                batch.append(_LOG_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            touched = []
+            for path, line in batch:
+                f = handles.get(path)
+                if f is None:
+                    _ensure_dir(path)
+                    f = handles[path] = open(path, "ab", buffering=1 << 16)
+                f.write(line)
+                if f not in touched:
+                    touched.append(f)
+            # one flush per batch so readers (the UI) see records promptly
+            for f in touched:
+                f.flush()
+        except Exception as e:
+            print(f"[plan log] write failed: {e}")
+        finally:
+            for _ in batch:
+                _LOG_QUEUE.task_done()
+
+def _ensure_writer() -> None:
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = threading.Thread(target=_writer_loop, name="plan-log-writer", daemon=True)
+            _WRITER.start()
+
+def flush_plan_logs() -> None:
+    """
+    Blocks until every queued record has been written and flushed.
+    """
+    if _WRITER is not None:
+        _LOG_QUEUE.join()
+
+atexit.register(flush_plan_logs)
+
 def log_plan_interaction(
     *,
     check_id: str,
@@ -18,6 +69,7 @@ def log_plan_interaction(
 ) -> str:
     """
     Appends a single JSON line with planner prompt/response for later UI consumption.
+    The write happens on the background writer; call flush_plan_logs() to wait for it.
     Returns the file path.
     """
     rec = {
@@ -28,25 +80,25 @@ def log_plan_interaction(
         "response_text": response_text,
         "inputs": inputs or {},
     }
-    _ensure_dir(path)
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    _ensure_writer()
+    _LOG_QUEUE.put_nowait((path, orjson.dumps(rec) + b"\n"))
     return path
 
 def tail_plan_logs(n: int = 50, path: str = PLAN_LOG_PATH) -> list[dict]:
     """
     Convenience for the UI or debugging: read last N entries from the JSONL file.
     """
+    flush_plan_logs()
     if not os.path.exists(path):
         return []
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "rb") as f:
         lines = f.readlines()
     out = []
     for ln in lines[-n:]:
         ln = ln.strip()
         if ln:
             try:
-                out.append(json.loads(ln))
+                out.append(orjson.loads(ln))
             except Exception:
                 pass
     return out
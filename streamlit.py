@@ -20,14 +20,30 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))  # Adds project root to sys.path
 import json
 import csv
+import heapq
 import os
+import warnings
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timezone
+from collections import defaultdict
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import streamlit as st
 
+try:
+    import orjson  # optional: several times faster than json for these payloads
+except ImportError:
+    orjson = None
+
 # -----------------------------
 # Config & helpers
 # -----------------------------
@@ -43,36 +59,141 @@ STATUS_COLORS = {
     "SKIPPED": "#6b7280", # gray
 }
 
-@st.cache_data(ttl=2)
+def json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # e.g. NaN/Infinity literals, which only the stdlib accepts
+    return json.loads(data)
+
+
+def json_dumps_bytes(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+# Loaders are cached on the file signature (path, mtime_ns, size), not a TTL:
+# reruns are a dict lookup until the file actually changes on disk.
+# Entries are bounded so superseded versions of a file (the plan log changes on every
+# planner call) are evicted instead of piling up in a long-running UI.
+SIG_CACHE_ENTRIES = 8
+# _read_json serves several files at once (checks, schema, summaries, per-key shards)
+JSON_CACHE_ENTRIES = 64
+
+def _file_sig(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st_ = path.stat()
+    except OSError:
+        return None
+    return st_.st_mtime_ns, st_.st_size
+
+
+@st.cache_data(show_spinner=False, max_entries=JSON_CACHE_ENTRIES)
+def _read_json(path_str: str, mtime_ns: int, size: int) -> Any:
+    return json_loads(Path(path_str).read_bytes())
+
 def read_json(path: Path) -> Any:
-    if not path.exists():
+    sig = _file_sig(path)
+    if sig is None:
         return None
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    return _read_json(str(path), *sig)
 
-@st.cache_data(ttl=2)
-def read_jsonl(path: Path, max_lines: Optional[int] = None) -> List[Dict[str, Any]]:
-    if not path.exists():
-        return []
-    lines = path.read_text(encoding="utf-8").splitlines()
-    if max_lines is not None:
-        lines = lines[-max_lines:]
+
+TAIL_CHUNK = 1 << 16  # bytes read per backwards step when tailing a JSONL file
+
+
+def _tail_lines(path_str: str, max_lines: int) -> List[bytes]:
+    """
+    Last `max_lines` lines of a file, reading backwards from EOF in TAIL_CHUNK steps.
+    """
+    chunks: List[bytes] = []
+    newlines = 0
+    with open(path_str, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        while pos > 0 and newlines <= max_lines:
+            step = min(TAIL_CHUNK, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            newlines += chunk.count(b"\n")
+            chunks.append(chunk)
+    lines = b"".join(reversed(chunks)).splitlines()
+    if pos > 0:
+        lines = lines[1:]  # first line may be cut mid-record
+    return lines[-max_lines:]
+
+
+@st.cache_data(show_spinner=False, max_entries=SIG_CACHE_ENTRIES)
+def _read_jsonl(path_str: str, mtime_ns: int, size: int, max_lines: Optional[int] = None) -> List[Dict[str, Any]]:
+    if not max_lines:
+        lines = Path(path_str).read_bytes().splitlines()
+    else:
+        lines = _tail_lines(path_str, max_lines)
     out: List[Dict[str, Any]] = []
     for ln in lines:
         ln = ln.strip()
         if not ln:
             continue
         try:
-            out.append(json.loads(ln))
+            out.append(json_loads(ln))
         except Exception:
             # skip malformed lines
             pass
     return out
 
-@st.cache_data(ttl=2)
-def read_csv_df(path: Path) -> pd.DataFrame:
-    if not path.exists():
+def read_jsonl(path: Path, max_lines: Optional[int] = None) -> List[Dict[str, Any]]:
+    sig = _file_sig(path)
+    if sig is None:
+        return []
+    return _read_jsonl(str(path), *sig, max_lines=max_lines)
+
+
+ENABLED_VALUES = {"true", "1", "yes"}
+
+@st.cache_resource(show_spinner=False, max_entries=SIG_CACHE_ENTRIES)
+def _checks_frame(path_str: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    df = pd.DataFrame(_read_json(path_str, mtime_ns, size) or [])
+    if "enabled" in df.columns:
+        df["_enabled_bool"] = [str(v).lower() in ENABLED_VALUES for v in df["enabled"].to_numpy()]
+    return df
+
+def load_checks_df(path: Path) -> pd.DataFrame:
+    """
+    checks.json as a DataFrame with the `enabled` flag parsed once per file version
+    (`_enabled_bool`), so the sidebar filter is a plain boolean mask. Treat as read-only.
+    """
+    sig = _file_sig(path)
+    if sig is None:
+        return pd.DataFrame()
+    return _checks_frame(str(path), *sig)
+
+
+@st.cache_data(show_spinner=False, max_entries=SIG_CACHE_ENTRIES)
+def _read_csv_df(path_str: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    path = Path(path_str)
+    # Columnar sidecar (<name>.parquet) is preferred; rebuilt whenever the CSV is newer
+    sidecar = path.with_suffix(".parquet")
+    csv_mtime = path.stat().st_mtime_ns if path.exists() else None
+    if sidecar.exists() and (csv_mtime is None or sidecar.stat().st_mtime_ns >= csv_mtime):
+        try:
+            return pq.read_table(sidecar).to_pandas()
+        except Exception:
+            pass
+    if csv_mtime is None:
         return pd.DataFrame()
+    try:
+        tbl = pacsv.read_csv(path)
+        try:
+            tmp = sidecar.with_suffix(".parquet.tmp")
+            pq.write_table(tbl, tmp, compression="zstd")
+            os.replace(tmp, sidecar)
+        except Exception:
+            pass  # read-only dir etc.: still serve the CSV
+        return tbl.to_pandas()
+    except Exception:
+        pass
     try:
         return pd.read_csv(path)
     except Exception:
@@ -84,6 +205,35 @@ def read_csv_df(path: Path) -> pd.DataFrame:
                 rows.append(dict(r))
         return pd.DataFrame(rows)
 
+def _csv_sig(path: Path) -> Optional[Tuple[int, int]]:
+    # keyed on the CSV (the sidecar is derived from it); a lone sidecar keys on itself
+    return _file_sig(path) or _file_sig(path.with_suffix(".parquet"))
+
+def read_csv_df(path: Path) -> pd.DataFrame:
+    sig = _csv_sig(path)
+    if sig is None:
+        return pd.DataFrame()
+    return _read_csv_df(str(path), *sig)
+
+
+# Columns shown in "Recent runs" (only those present are kept)
+DISPLAY_COLS = ["check_id", "check_name", "status", "finished_at", "summary", "severity", "target_table"]
+
+@st.cache_resource(show_spinner=False, max_entries=SIG_CACHE_ENTRIES)
+def _recent_runs_table(path_str: str, mtime_ns: int, size: int) -> pa.Table:
+    df = _read_csv_df(path_str, mtime_ns, size)
+    return pa.Table.from_pandas(df[[c for c in DISPLAY_COLS if c in df.columns]], preserve_index=False)
+
+def recent_runs_table(path: Path) -> pa.Table:
+    """
+    Display projection of checks_last as an Arrow table (built once per file version;
+    st.dataframe takes it without another pandas → Arrow conversion).
+    """
+    sig = _csv_sig(path)
+    if sig is None:
+        return pa.table({})
+    return _recent_runs_table(str(path), *sig)
+
 
 def badge(text: str, color: str) -> str:
     return f"""
@@ -93,41 +243,106 @@ def badge(text: str, color: str) -> str:
     """
 
 
+def _check_id_mask(df: pd.DataFrame, check_id: str) -> np.ndarray:
+    # Compare on the raw ndarray (check_id may be parsed as int); avoids Series.astype(str) boxing
+    return df["check_id"].to_numpy().astype(str) == str(check_id)
+
+
 def find_latest_status_for_check(check_id: str, checks_last: pd.DataFrame) -> Optional[Dict[str, Any]]:
     if checks_last.empty:
         return None
-    df = checks_last[checks_last["check_id"].astype(str) == str(check_id)].copy()
+    df = checks_last[_check_id_mask(checks_last, check_id)]
     if df.empty:
         return None
-    # sort by finished_at if present
+    # newest finished_at if present: one argmax pass, no sort
+    pos = 0
     if "finished_at" in df.columns:
-        try:
-            df["_finished_at"] = pd.to_datetime(df["finished_at"], errors="coerce")
-            df = df.sort_values("_finished_at", ascending=False)
-        except Exception:
-            pass
-    return df.iloc[0].to_dict()
+        finished = df["finished_at"]
+        if pd.api.types.is_datetime64_any_dtype(finished):
+            pos = int(np.argmax(pd.DatetimeIndex(finished).asi8))  # NaT is the int64 minimum, so it never wins
+        else:
+            # ISO-8601 UTC strings order lexically: no per-row datetime parse
+            pos = int(np.argmax(finished.fillna("").to_numpy().astype(str)))
+    return df.iloc[pos].to_dict()
 
 
-def runs_for_check(workflows: Dict[str, Any], check_id: str) -> List[Dict[str, Any]]:
-    # Find the key that starts with the selected check_id
-    key = next((k for k in workflows.keys() if k.startswith(f"{check_id}::")), None)
-    if key:
-        return workflows[key]
-    return []
+@st.cache_data(show_spinner=False, max_entries=SIG_CACHE_ENTRIES)
+def _workflows_by_check(path_str: str, mtime_ns: int, size: int) -> Dict[str, List[Dict[str, Any]]]:
+    workflows = _read_json(path_str, mtime_ns, size)
+    by_check: Dict[str, List[Dict[str, Any]]] = {}
+    if isinstance(workflows, dict):
+        for k, v in workflows.items():
+            # keys are "<check_id>::<check_name>"; first entry wins, as with the old prefix scan
+            if "::" in k:
+                by_check.setdefault(k.split("::", 1)[0], v)
+    return by_check
 
+def shard_path(shard_dir: Path, key: str) -> Path:
+    return shard_dir / f"{quote(str(key), safe='')}.json"
 
-def extract_run_ids(runs: List[Dict[str, Any]]) -> List[str]:
-    ids = []
-    for r in runs:
-        rid = r.get("run_id")
-        if rid:
-            ids.append(rid)
-    # sort newest first based on timestamp inside run_id if present
-    try:
-        ids = sorted(ids, key=lambda s: s.split("_")[0], reverse=True)
-    except Exception:
-        pass
+
+def fresh_shard(shard_dir: Path, key: str, source: Path) -> Any:
+    """
+    A per-key shard, but only when it is at least as new as the monolithic file it mirrors
+    (a replaced or deleted source makes older shards stale). None otherwise.
+    Used for workflows.json, which the agent still writes in full.
+    """
+    shard = shard_path(shard_dir, key)
+    sig, src = _file_sig(shard), _file_sig(source)
+    if sig is None or src is None or sig[0] < src[0]:
+        return None
+    return _read_json(str(shard), *sig)
+
+
+def runs_for_check(check_id: str) -> List[Dict[str, Any]]:
+    """
+    Workflow steps for one check: its shard if fresh, else the workflows.json index.
+    """
+    runs = fresh_shard(workflows_shard_dir, check_id, workflows_path)
+    if isinstance(runs, list):
+        return runs
+    return workflows_by_check(workflows_path).get(check_id, [])
+
+
+def ai_summaries_for(tables: List[str]) -> Dict[str, Any]:
+    """
+    Summaries for the given tables (or, with none given, every table) from their shards.
+    The legacy ai_table_summaries.json is only read when no shard directory exists yet.
+    """
+    if not ai_summaries_shard_dir.is_dir():
+        allsum = read_json(ai_summaries_path) or {}
+        return {t: allsum[t] for t in tables if t in allsum} if tables else allsum
+    if not tables:
+        tables = sorted(unquote(p.stem) for p in ai_summaries_shard_dir.glob("*.json"))
+    out: Dict[str, Any] = {}
+    for t in tables:
+        entry = read_json(shard_path(ai_summaries_shard_dir, t))
+        if isinstance(entry, dict):
+            out[t] = entry
+    return out
+
+
+def workflows_by_check(path: Path) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    check_id -> workflow steps from workflows.json (built once per file version).
+    """
+    sig = _file_sig(path)
+    if sig is None:
+        return {}
+    return _workflows_by_check(str(path), *sig)
+
+
+def _run_id_ts(run_id: str) -> str:
+    return run_id.split("_", 1)[0]
+
+
+def extract_run_ids(runs: List[Dict[str, Any]], limit: Optional[int] = None) -> List[str]:
+    ids = [str(rid) for rid in (r.get("run_id") for r in runs) if rid]
+    # newest first based on the timestamp prefix of run_id (key computed once per id);
+    # with a limit only the top entries are selected, same order as a full sort
+    if limit is not None:
+        return heapq.nlargest(limit, ids, key=_run_id_ts)
+    ids.sort(key=_run_id_ts, reverse=True)
     return ids
 
 
@@ -140,44 +355,203 @@ def safe_get(d: Dict[str, Any], path: List[str], default: Any = None) -> Any:
     return cur if cur is not None else default
 
 
-def filter_plan_logs_by_check(plan_logs: List[Dict[str, Any]], check_id: str) -> List[Dict[str, Any]]:
-    return [x for x in plan_logs if str(x.get("check_id")) == str(check_id)]
+@st.cache_data(show_spinner=False, max_entries=SIG_CACHE_ENTRIES)
+def _plan_logs_by_check(path_str: str, mtime_ns: int, size: int, max_lines: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+    by_check: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for rec in _read_jsonl(path_str, mtime_ns, size, max_lines=max_lines):
+        by_check[str(rec.get("check_id"))].append(rec)
+    return dict(by_check)
+
+def plan_logs_by_check(path: Path, max_lines: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Planner log records bucketed by check_id (built once per log file version).
+    """
+    sig = _file_sig(path)
+    if sig is None:
+        return {}
+    return _plan_logs_by_check(str(path), *sig, max_lines=max_lines)
+
+
+PLAN_LOG_TAIL = 2000  # newest planner log lines loaded by the UI
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _plan_log_jsonl_blob(path_str: str, mtime_ns: int, size: int, check_id: str, max_lines: Optional[int]) -> bytes:
+    recs = _plan_logs_by_check(path_str, mtime_ns, size, max_lines=max_lines).get(check_id, [])
+    return b"\n".join(json_dumps_bytes(x) for x in recs)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _plan_log_arrow_blob(path_str: str, mtime_ns: int, size: int, check_id: str, max_lines: Optional[int]) -> bytes:
+    """
+    Same records as an Arrow IPC stream (zstd). Nested fields (prompt_msgs, inputs)
+    are stored as JSON strings so the schema stays flat and stable across records.
+    """
+    recs = _plan_logs_by_check(path_str, mtime_ns, size, max_lines=max_lines).get(check_id, [])
+    rows = [
+        {k: v if v is None or isinstance(v, str) else json_dumps_bytes(v).decode("utf-8") for k, v in rec.items()}
+        for rec in recs
+    ]
+    tbl = pa.Table.from_pylist(rows)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tbl.schema, options=pa.ipc.IpcWriteOptions(compression="zstd")) as writer:
+        writer.write_table(tbl)
+    return sink.getvalue().to_pybytes()
+
+
+def parse_ts(ts: Optional[str]) -> Optional[datetime]:
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+
+def _ts64(ts: Any) -> np.datetime64:
+    """
+    Single timestamp -> naive-UTC datetime64[us] via parse_ts (handles explicit offsets); NaT if unparseable.
+    """
+    dt = ts if isinstance(ts, datetime) else parse_ts(ts if isinstance(ts, str) else None)
+    if dt is None:
+        return np.datetime64("NaT", "us")
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(dt, "us")
+
+
+def parse_ts_arr(strs: List[Any]) -> np.ndarray:
+    """
+    ISO-8601 strings -> datetime64[us] in one numpy parse (trailing "Z" dropped, missing -> NaT).
+    Falls back to per-item parsing when an entry has an explicit offset or is malformed.
+    """
+    vals = [s[:-1] if isinstance(s, str) and s.endswith("Z") else (s or "NaT") for s in strs]
+    try:
+        with warnings.catch_warnings():
+            # numpy only warns (and guesses) on "+hh:mm" offsets; treat that as a parse miss
+            warnings.simplefilter("error")
+            return np.array(vals, dtype="datetime64[us]")
+    except Exception:
+        return np.array([_ts64(s) for s in strs], dtype="datetime64[us]")
+
+
+def nearest_logs(logs: List[Dict[str, Any]], start_dt: datetime, k: int = 8) -> List[Dict[str, Any]]:
+    """
+    The k logs closest in time to start_dt, nearest first (ties and undated logs keep file order).
+    Timestamps are parsed in one vector pass; selection is a partition, not a full sort.
+    """
+    if not logs:
+        return []
+    start = _ts64(start_dt)
+    ts = parse_ts_arr([l.get("ts") for l in logs])
+    deltas = np.abs(ts - start).astype("int64")
+    deltas[np.isnat(ts) | np.isnat(start)] = np.iinfo(np.int64).max
+    k = min(k, len(logs))
+    kth = np.partition(deltas, k - 1)[k - 1]
+    below = np.flatnonzero(deltas < kth)
+    top = np.concatenate([below, np.flatnonzero(deltas == kth)[:k - len(below)]])
+    top = top[np.lexsort((top, deltas[top]))]
+    return [logs[i] for i in top]
 
 
 def pretty_json(obj: Any) -> str:
     try:
+        if orjson is not None:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
         return json.dumps(obj, indent=2, ensure_ascii=False)
     except Exception:
         return str(obj)
 
 
+@st.cache_data(max_entries=256, show_spinner=False)
+def pretty_json_cached(payload: bytes) -> str:
+    """
+    pretty_json keyed on the compact serialized bytes, so reopening a panel reuses the string.
+    """
+    return pretty_json(json_loads(payload))
+
+
+def pretty_json_memo(obj: Any) -> str:
+    try:
+        payload = json_dumps_bytes(obj)
+    except Exception:
+        return pretty_json(obj)
+    return pretty_json_cached(payload)
+
+
+@st.cache_data(show_spinner=False, max_entries=SIG_CACHE_ENTRIES)
+def check_labels(path_str: str, sig: Optional[Tuple[int, int]], enabled_only: bool,
+                 _checks_df: pd.DataFrame) -> Tuple[Tuple[str, ...], Dict[str, int]]:
+    """
+    Sidebar labels "<name> (<id>)" and label -> row position; rebuilt only when
+    checks.json (path + signature) or the enabled filter changes.
+    """
+    n = len(_checks_df)
+    names = _checks_df["check_name"].fillna("(unnamed)").to_numpy() if "check_name" in _checks_df else ["(unnamed)"] * n
+    ids = _checks_df["check_id"].fillna("?").to_numpy() if "check_id" in _checks_df else ["?"] * n
+    labels = tuple(f"{name} ({cid})" for name, cid in zip(names, ids))
+    label_to_idx: Dict[str, int] = {}
+    for idx, lbl in enumerate(labels):
+        label_to_idx.setdefault(lbl, idx)  # first match, like list.index
+    return labels, label_to_idx
+
+
+@st.cache_resource(show_spinner=False)
+def _paths(base_str: str) -> SimpleNamespace:
+    """
+    All contract paths under the backend dir, resolved once per base dir string
+    (Path.resolve() stats every component).
+    """
+    b = Path(base_str).resolve()
+    cache = b / "cached_mem"
+    return SimpleNamespace(
+        base=b,
+        checks=b / "checks" / "checks.json",
+        schema=cache / "schema_cols.json",
+        ai_summaries=cache / "ai_table_summaries.json",
+        checks_last=cache / "checks_last.csv",
+        workflows=cache / "workflows.json",
+        plan_log=cache / "plan_prompt_log.jsonl",
+        last_result=cache / "last_result.txt",
+        workflows_shards=cache / "workflows",
+        ai_summaries_shards=cache / "ai_table_summaries",
+    )
+
+
 # -----------------------------
 # Sidebar: base dir and check selection
 # -----------------------------
 
 st.sidebar.header("Settings")
-base_dir = Path(st.sidebar.text_input("Backend base dir", value=DEFAULT_BASE_DIR))
-
-checks_path = base_dir.resolve() / "checks" / "checks.json"
-schema_path = base_dir.resolve() / "cached_mem" / "schema_cols.json"
-ai_summaries_path = base_dir.resolve() / "cached_mem" / "ai_table_summaries.json"
-checks_last_path = base_dir.resolve() / "cached_mem" / "checks_last.csv"
-workflows_path = base_dir.resolve() / "cached_mem" / "workflows.json"
-plan_log_path = base_dir.resolve() / "cached_mem" / "plan_prompt_log.jsonl"
-last_result_path = base_dir.resolve() / "cached_mem" / "last_result.txt"
+base_dir_str = st.sidebar.text_input("Backend base dir", value=DEFAULT_BASE_DIR)
+P = _paths(base_dir_str)
+
+checks_path = P.checks
+schema_path = P.schema
+ai_summaries_path = P.ai_summaries
+checks_last_path = P.checks_last
+workflows_path = P.workflows
+plan_log_path = P.plan_log
+last_result_path = P.last_result
+# Per-key shards written next to the monolithic files (one check / one table per file)
+workflows_shard_dir = P.workflows_shards
+ai_summaries_shard_dir = P.ai_summaries_shards
 
 col1, col2 = st.sidebar.columns(2)
 with col1:
     if st.button("Refresh data"):
-        read_json.clear()
-        read_jsonl.clear()
-        read_csv_df.clear()
+        _read_json.clear()
+        _read_jsonl.clear()
+        _read_csv_df.clear()
+        _checks_frame.clear()
+        _plan_logs_by_check.clear()
+        _workflows_by_check.clear()
+        _recent_runs_table.clear()
         st.rerun()
 with col2:
     st.write("")
 
-checks = read_json(checks_path) or []
-checks_df = pd.DataFrame(checks)
+checks_df = load_checks_df(checks_path)
 
 if checks_df.empty:
     st.sidebar.error(f"No checks found at {checks_path}")
@@ -185,14 +559,15 @@ if checks_df.empty:
 
 # Display basic filters
 enabled_only = st.sidebar.checkbox("Show only enabled", value=False)
-if enabled_only and "enabled" in checks_df.columns:
-    checks_df = checks_df[checks_df["enabled"].astype(str).str.lower().isin(["true", "1", "yes"])].copy()
+if enabled_only and "_enabled_bool" in checks_df.columns:
+    checks_df = checks_df[checks_df["_enabled_bool"].to_numpy()]
 
 # Choose a check
-check_names = [f"{row.get('check_name','(unnamed)')} ({row.get('check_id','?')})" for _, row in checks_df.iterrows()]
+check_names, label_to_idx = check_labels(str(checks_path), _file_sig(checks_path), enabled_only, checks_df)
 choice = st.sidebar.selectbox("Select a check", options=check_names)
-sel_idx = check_names.index(choice)
+sel_idx = label_to_idx[choice]
 sel_row = checks_df.iloc[sel_idx].to_dict()
+sel_row.pop("_enabled_bool", None)
 sel_check_id = str(sel_row.get("check_id"))
 
 # -----------------------------
@@ -200,12 +575,10 @@ sel_check_id = str(sel_row.get("check_id"))
 # -----------------------------
 
 checks_last = read_csv_df(checks_last_path)
-workflows = read_json(workflows_path) or {"runs": []}
-plan_logs_all = read_jsonl(plan_log_path, max_lines=2000)
-plan_logs_for_check = filter_plan_logs_by_check(plan_logs_all, sel_check_id)
+plan_logs_for_check = plan_logs_by_check(plan_log_path, max_lines=PLAN_LOG_TAIL).get(sel_check_id, [])
+plan_log_sig = _file_sig(plan_log_path)
 
 schema_cols = read_json(schema_path) or {}
-ai_summaries = read_json(ai_summaries_path) or {}
 
 # -----------------------------
 # Main layout
@@ -240,12 +613,13 @@ st.markdown("### Recent runs")
 if checks_last.empty:
     st.info("No recent runs.")
 else:
-    show_df = checks_last.copy()
+    show_tbl = recent_runs_table(checks_last_path)
     # keep only this check's runs visible by default, with toggle
     only_this = st.checkbox("Show only this check", value=True)
-    if only_this:
-        show_df = show_df[show_df["check_id"].astype(str) == sel_check_id]
-    st.dataframe(show_df, use_container_width=True, hide_index=True)
+    if only_this and "check_id" in show_tbl.column_names:
+        ids = pc.cast(show_tbl["check_id"], pa.string())
+        show_tbl = show_tbl.filter(pc.fill_null(pc.equal(ids, sel_check_id), False))
+    st.dataframe(show_tbl, use_container_width=True, hide_index=True)
 
 
 # import sys
@@ -253,35 +627,82 @@ else:
 
 from backend.agent import main as agent_main
 
-if st.button("Run Agent Workflow"):
-    with st.spinner("Running agent.py..."):
-        agent_main()
-    st.success("Agent workflow completed.")
+# The agent runs on a background thread so the page stays usable meanwhile;
+# a polling fragment watches the future and triggers a full rerun once it finishes.
+AGENT_POLL_SECONDS = 1.0
+
+
+@st.cache_resource(show_spinner=False)
+def agent_executor() -> ThreadPoolExecutor:
+    """
+    One single-thread executor for the whole server: runs requested from several sessions
+    queue up instead of calling agent_main() concurrently on the same cache files.
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-run")
+
+
+@st.fragment(run_every=AGENT_POLL_SECONDS)
+def agent_run_status() -> None:
+    fut = st.session_state.get("agent_future")
+    if fut is None:
+        return
+    if not fut.done():
+        with st.status("Running agent.py...", state="running"):
+            st.caption("You can keep browsing; the page reloads when the run finishes.")
+        return
+    st.session_state.pop("agent_future")
+    exc = fut.exception()
+    st.session_state.agent_outcome = f"Agent workflow failed: {exc}" if exc else None
+    st.rerun()  # full rerun so the artifacts the agent wrote are reloaded
+
+
+agent_running = st.session_state.get("agent_future") is not None
+if st.button("Run Agent Workflow", disabled=agent_running):
+    st.session_state.agent_future = agent_executor().submit(agent_main)
+    agent_running = True
+if agent_running:
+    agent_run_status()
+elif "agent_outcome" in st.session_state:
+    outcome = st.session_state.pop("agent_outcome")
+    if outcome:
+        st.error(outcome)
+    else:
+        st.success("Agent workflow completed.")
 
 # -----------------------------
 # Run detail
 # -----------------------------
-st.markdown("---")
-st.markdown("### Run detail")
+# Each panel is an st.fragment: widget events inside it (run picker, downloads) rerun only
+# that panel, not the sidebar, the loaders and the rest of the page.
 
-_sel_runs = runs_for_check(workflows, sel_check_id)
-if not _sel_runs:
-    st.info("No run details found for this check in workflows.json")
-else:
+def run_label(run: Dict[str, Any]) -> str:
     # Build labels from the structure you actually have: type + compiled_at (+ status if present)
-    def run_label(run: Dict[str, Any]) -> str:
-        t = run.get("type", "?")
-        ts = run.get("compiled_at", "")
-        res_status = (run.get("artifact", {}) or {}).get("result", {}) or {}
-        s = res_status.get("status")
-        return f"{t}{f' — {s}' if s else ''} @ {ts}"
-
+    t = run.get("type", "?")
+    ts = run.get("compiled_at", "")
+    res_status = (run.get("artifact", {}) or {}).get("result", {}) or {}
+    s = res_status.get("status")
+    return f"{t}{f' — {s}' if s else ''} @ {ts}"
+
+
+def render_cell(idx: int, cell: Dict[str, Any]) -> None:
+    # st.code ships raw text; syntax highlighting happens in the browser, not here
+    st.write(f"**Cell {idx+1}** (exit_code={cell.get('exit_code', '-')})")
+    st.code(cell.get("python_repl", "") or "# (no code)", language="python")
+    if cell.get("stdout"):
+        with st.expander("stdout"):
+            st.code(str(cell.get("stdout")))
+
+
+@st.fragment
+def render_run_detail(sel_runs: List[Dict[str, Any]], check_id: str,
+                      plan_logs: List[Dict[str, Any]], plan_log_sig: Optional[Tuple[int, int]],
+                      last_result_path: Path) -> None:
     # Use index-based selection (since there's no run_id in the JSON you posted)
-    idx_options = list(range(len(_sel_runs)))
+    idx_options = list(range(len(sel_runs)))
     run_idx = st.selectbox("Choose a run", options=idx_options,
-                           format_func=lambda i: run_label(_sel_runs[i]),
+                           format_func=lambda i: run_label(sel_runs[i]),
                            index=0)
-    run_obj = _sel_runs[run_idx]
+    run_obj = sel_runs[run_idx]
     artifact = run_obj.get("artifact", {}) or {}
 
     # Summary line (execution runs have artifact.result)
@@ -303,11 +724,7 @@ else:
     if not repls:
         st.caption("No python executions recorded.")
     for i, cell in enumerate(repls):
-        st.write(f"**Cell {i+1}** (exit_code={cell.get('exit_code', '-')})")
-        st.code(cell.get("python_repl", "") or "# (no code)", language="python")
-        if cell.get("stdout"):
-            with st.expander("stdout"):
-                st.code(str(cell.get("stdout")))
+        render_cell(i, cell)
 
     # Saved/linked artifacts (prefer explicit saved path if present; else fallback)
     saved_to = (result.get("saved") or {}).get("saved_to") or str(last_result_path)
@@ -321,65 +738,85 @@ else:
 
     # Plan details (when the selected entry is a plan)
     with st.expander("Planner plan JSON (artifact)"):
-        st.code(pretty_json(artifact), language="json")
+        st.code(pretty_json_memo(artifact), language="json")
+
+    render_planner_conversation(run_obj, check_id, plan_logs, plan_log_sig)
 
+
+@st.fragment
+def render_planner_conversation(run_obj: Dict[str, Any], check_id: str, plan_logs: List[Dict[str, Any]],
+                                plan_log_sig: Optional[Tuple[int, int]]) -> None:
     # Planner conversation remains filtered by check_id as you already do:
     with st.expander("Planner conversation (prompt & response)"):
-        if not plan_logs_for_check:
+        if not plan_logs:
             st.caption("No planner logs for this check.")
+            return
+        # same logic you already have…
+        started_at = run_obj.get("started_at")
+        start_dt = parse_ts(started_at)
+        if start_dt:
+            logs = nearest_logs(plan_logs, start_dt, k=8)
         else:
-            # same logic you already have…
-            started_at = run_obj.get("started_at")
-            def parse_ts(ts: Optional[str]) -> Optional[datetime]:
-                if not ts:
-                    return None
-                try:
-                    return datetime.fromisoformat(ts.replace("Z", "+00:00"))
-                except Exception:
-                    return None
-            start_dt = parse_ts(started_at)
-            logs = plan_logs_for_check
-            if start_dt:
-                def dist(l):
-                    lts = parse_ts(l.get("ts"))
-                    return abs((lts - start_dt).total_seconds()) if lts and start_dt else 9e18
-                logs = sorted(logs, key=dist)
-            logs = logs[:8]
-            for j, rec in enumerate(logs, start=1):
-                st.write(f"**Log {j} — {rec.get('ts','')} — model: {rec.get('model','')}**")
-                for m in rec.get("prompt_msgs", []):
-                    st.markdown(f"**{m.get('role','').upper()}**")
-                    st.code(m.get("content", ""))
-                with st.expander("model response"):
-                    st.code(rec.get("response_text", ""))
-                with st.expander("inputs passed to planner"):
-                    st.code(pretty_json(rec.get("inputs", {})), language="json")
-            dl = "\n".join(json.dumps(x, ensure_ascii=False) for x in plan_logs_for_check)
-            st.download_button("Download planner logs (this check)", dl.encode("utf-8"),
-                               file_name=f"{sel_check_id}_planner_logs.jsonl")
-
+            logs = plan_logs[:8]
+        for j, rec in enumerate(logs, start=1):
+            st.write(f"**Log {j} — {rec.get('ts','')} — model: {rec.get('model','')}**")
+            for m in rec.get("prompt_msgs", []):
+                st.markdown(f"**{m.get('role','').upper()}**")
+                st.code(m.get("content", ""))
+            with st.expander("model response"):
+                st.code(rec.get("response_text", ""))
+            with st.expander("inputs passed to planner"):
+                st.code(pretty_json_memo(rec.get("inputs", {})), language="json")
+        if plan_log_sig is None:
+            return
+        # blobs are built once per (log version, check) instead of on every rerun
+        key = (str(plan_log_path), *plan_log_sig, check_id, PLAN_LOG_TAIL)
+        dl_jsonl, dl_arrow = st.columns(2)
+        with dl_jsonl:
+            st.download_button("Download planner logs (this check)", _plan_log_jsonl_blob(*key),
+                               file_name=f"{check_id}_planner_logs.jsonl")
+        with dl_arrow:
+            st.download_button("Download as Arrow", _plan_log_arrow_blob(*key),
+                               file_name=f"{check_id}_planner_logs.arrow",
+                               mime="application/vnd.apache.arrow.stream")
+
+
+@st.fragment
+def render_ai_summaries(targets: List[str], ai_summaries: Dict[str, Any]) -> None:
     with st.expander("AI table summaries"):
         if not ai_summaries:
             st.caption("No ai_table_summaries.json found")
-        else:
-            # Show only relevant tables if target_table exists
-            tgt = sel_row.get("target_table") or ""
-            targets = [t.strip() for t in str(tgt).split(",") if t.strip()]
-            tables = targets or list(ai_summaries.keys())
-            for t in tables:
-                if t in ai_summaries:
-                    st.write(f"**{t}**")
-                    st.code(pretty_json(ai_summaries.get(t)), language="json")
+            return
+        # Show only relevant tables if target_table exists
+        tables = targets or list(ai_summaries.keys())
+        for t in tables:
+            if t in ai_summaries:
+                st.write(f"**{t}**")
+                st.code(pretty_json_memo(ai_summaries.get(t)), language="json")
+
 
+@st.fragment
+def render_schemas(targets: List[str], schema_cols: Dict[str, Any]) -> None:
     with st.expander("Schemas (schema_cols.json)"):
         if not schema_cols:
             st.caption("No schema_cols.json found")
-        else:
-            tgt = sel_row.get("target_table") or ""
-            targets = [t.strip() for t in str(tgt).split(",") if t.strip()]
-            to_show = {t: schema_cols.get(t) for t in (targets or list(schema_cols.keys())) if t in schema_cols}
-            st.code(pretty_json(to_show or schema_cols), language="json")
+            return
+        to_show = {t: schema_cols.get(t) for t in (targets or list(schema_cols.keys())) if t in schema_cols}
+        st.code(pretty_json_memo(to_show or schema_cols), language="json")
+
+
+st.markdown("---")
+st.markdown("### Run detail")
+
+_sel_runs = runs_for_check(sel_check_id)
+if not _sel_runs:
+    st.info("No run details found for this check in workflows.json")
+else:
+    render_run_detail(_sel_runs, sel_check_id, plan_logs_for_check, plan_log_sig, last_result_path)
+    sel_targets = [t.strip() for t in str(sel_row.get("target_table") or "").split(",") if t.strip()]
+    render_ai_summaries(sel_targets, ai_summaries_for(sel_targets))
+    render_schemas(sel_targets, schema_cols)
 
 # Footer note
 st.markdown("---")
-st.caption(f"Base dir: {base_dir.resolve()} | checks: {checks_path} | workflows: {workflows_path} | log: {plan_log_path}")
+st.caption(f"Base dir: {P.base} | checks: {checks_path} | workflows: {workflows_path} | log: {plan_log_path}")